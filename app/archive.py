@@ -0,0 +1,182 @@
+"""Архив загруженных парсером страниц."""
+import os
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_right
+
+
+class ResponseArchive:
+    """
+    Класс, реализующий сжатый архив страниц, пополняемый только
+    добавлением в конец.
+
+    Архив хранится в каталоге и состоит из сегментов - файлов, в которые
+    последовательно записываются независимо сжатые записи, и индекса,
+    позволяющего прочитать любую запись без просмотра сегментов.
+    Запись сегмента: заголовок (длина ключа, длина данных, время),
+    ключ в utf-8 и сжатое содержимое страницы.
+    """
+    __slots__ = ('_path', '_segment_size', '_level', '_lock', '_index', '_segment')
+
+    _HEADER = struct.Struct('>IId')
+    _INDEX_FILE = 'index.tsv'
+    _SEGMENT_SUFFIX = '.seg'
+
+    def __init__(self, path: str, segment_size: int = 64 * 1024 * 1024, level: int = 6) -> None:
+        """
+        Инициализация объекта класса.
+
+        Args:
+            path: str - каталог архива, создается при отсутствии.
+            segment_size: int - размер сегмента в байтах, после которого
+                                начинается новый сегмент
+                                (default: 64 МБ).
+            level: int - уровень сжатия zlib (default: 6).
+        """
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+        self._segment_size = segment_size
+        self._level = level
+        self._lock = threading.Lock()
+        self._index = {}
+        if not self._load_index():
+            self.rebuild_index()
+        segments = self._segments()
+        self._segment = segments[-1] if segments else 0
+
+    def _segments(self) -> list[int]:
+        """Номера имеющихся сегментов по возрастанию."""
+        return sorted(int(name[:-len(self._SEGMENT_SUFFIX)]) for name in os.listdir(self._path)
+                      if name.endswith(self._SEGMENT_SUFFIX))
+
+    def _segment_path(self, segment: int) -> str:
+        """Путь к файлу сегмента с указанным номером."""
+        return os.path.join(self._path, f'{segment:06d}{self._SEGMENT_SUFFIX}')
+
+    def _add_to_index(self, key: str, timestamp: float, segment: int, offset: int, length: int) -> None:
+        """Добавление записи в индекс в памяти с сохранением порядка по времени."""
+        entries = self._index.setdefault(key, [])
+        entry = (timestamp, segment, offset, length)
+        if not entries or entries[-1][0] <= timestamp:
+            entries.append(entry)
+        else:
+            entries.insert(bisect_right(entries, entry), entry)
+
+    def _load_index(self) -> bool:
+        """
+        Загрузка индекса из файла.
+
+        Returns:
+            True, если индекс описывает все записи сегментов, и False,
+            если файл индекса отсутствует, оборван или в сегментах есть
+            записи, не попавшие в индекс, например, после аварийного
+            завершения между записью в сегмент и в индекс.
+        """
+        index_path = os.path.join(self._path, self._INDEX_FILE)
+        complete = True
+        ends = {}
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t', 4)
+                    if not line.endswith('\n') or len(parts) != 5:
+                        complete = False
+                        continue
+                    timestamp, segment, offset, length, key = parts
+                    segment, offset, length = int(segment), int(offset), int(length)
+                    self._add_to_index(key, float(timestamp), segment, offset, length)
+                    ends[segment] = max(ends.get(segment, 0), offset + length)
+        return complete and all(os.path.getsize(self._segment_path(segment)) == ends.get(segment, 0)
+                                for segment in self._segments())
+
+    def rebuild_index(self) -> None:
+        """
+        Перестроение индекса по содержимому сегментов. Выполняется при
+        открытии архива, если файл индекса утерян или не успел
+        записаться. Оборванная запись в конце сегмента удаляется, чтобы
+        следующие записи не оказались после нее.
+        """
+        with self._lock:
+            self._index = {}
+            lines = []
+            for segment in self._segments():
+                with open(self._segment_path(segment), 'r+b') as f:
+                    offset = 0
+                    while True:
+                        header = f.read(self._HEADER.size)
+                        if len(header) < self._HEADER.size:
+                            break
+                        key_length, data_length, timestamp = self._HEADER.unpack(header)
+                        key = f.read(key_length)
+                        f.seek(data_length, os.SEEK_CUR)
+                        length = self._HEADER.size + key_length + data_length
+                        if len(key) < key_length or f.tell() > os.fstat(f.fileno()).st_size:
+                            break
+                        key = key.decode('utf-8')
+                        self._add_to_index(key, timestamp, segment, offset, length)
+                        lines.append(f'{timestamp!r}\t{segment}\t{offset}\t{length}\t{key}\n')
+                        offset += length
+                    if os.fstat(f.fileno()).st_size > offset:
+                        f.truncate(offset)
+            with open(os.path.join(self._path, self._INDEX_FILE), 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+
+    def put(self, key: str, content: bytes, timestamp: float = None) -> None:
+        """
+        Добавление страницы в архив.
+
+        Args:
+            key: str - ключ страницы (обычно ссылка).
+            content: bytes - содержимое страницы.
+            timestamp: float - время загрузки, по умолчанию текущее.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        encoded_key = key.encode('utf-8')
+        data = zlib.compress(content, self._level)
+        record = self._HEADER.pack(len(encoded_key), len(data), timestamp) + encoded_key + data
+        with self._lock:
+            segment_path = self._segment_path(self._segment)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self._segment_size:
+                self._segment += 1
+                segment_path = self._segment_path(self._segment)
+            with open(segment_path, 'ab') as f:
+                offset = f.tell()
+                f.write(record)
+            with open(os.path.join(self._path, self._INDEX_FILE), 'a', encoding='utf-8') as f:
+                f.write(f'{timestamp!r}\t{self._segment}\t{offset}\t{len(record)}\t{key}\n')
+            self._add_to_index(key, timestamp, self._segment, offset, len(record))
+
+    def get(self, key: str, at: float = None) -> bytes:
+        """
+        Чтение страницы из архива.
+
+        Args:
+            key: str - ключ страницы.
+            at: float - момент времени; возвращается последняя версия
+                        страницы, загруженная не позже него. По умолчанию
+                        возвращается последняя версия.
+
+        Returns:
+            Содержимое страницы.
+
+        Raises:
+            KeyError, если подходящей версии страницы в архиве нет.
+        """
+        entries = self._index.get(key, [])
+        if at is not None:
+            entries = entries[:bisect_right(entries, (at, float('inf')))]
+        if not entries:
+            raise KeyError(key)
+        _, segment, offset, length = entries[-1]
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            record = f.read(length)
+        key_length, _, _ = self._HEADER.unpack_from(record)
+        return zlib.decompress(record[self._HEADER.size + key_length:])
+
+    def keys(self) -> list[str]:
+        """Список ключей всех страниц архива."""
+        return list(self._index)
@@ -40,6 +40,7 @@ class BaseApp(ABC):
         в _chosen_user.
         """
         self._parser.log_in(self._chosen_user.email, self._chosen_user.password)
+        self._parser.remember_items(self._chosen_user.favorite_items)
         self._chosen_user =  self._parser.parse()
 
     def load_users(self) -> list[User]:
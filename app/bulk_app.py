@@ -0,0 +1,159 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, TextIO
+from app.db import DBTool
+from app.parser import SiriustParser, PageCache
+from app.entities import User
+
+
+def read_credentials(stream: TextIO) -> list[tuple[str, str]]:
+    """
+    Чтение учетных данных пользователей. Каждая строка имеет вид
+    `почта:пароль`, пустые строки и строки, начинающиеся с `#`,
+    пропускаются.
+
+    Args:
+        stream: TextIO - файл или стандартный ввод.
+
+    Returns:
+        Список пар (почта, пароль).
+
+    Raises:
+        ValueError, если строка не соответствует формату.
+    """
+    credentials = []
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        email, separator, password = line.partition(':')
+        if not separator or not email:
+            raise ValueError(f'Строка {line_number}: ожидается формат почта:пароль.')
+        credentials.append((email.strip(), password))
+    return credentials
+
+
+class BulkApp():
+    """
+    Неинтерактивная загрузка данных нескольких пользователей: авторизация
+    и парсинг выполняются пулом потоков, страницы товаров, общие для
+    нескольких пользователей, загружаются один раз, а результаты
+    сохраняются в БД пакетами.
+    """
+    def __init__(self,
+                 db: DBTool,
+                 parser: SiriustParser,
+                 credentials: list[tuple[str, str]],
+                 workers: int = 4,
+                 batch_size: int = 50) -> None:
+        """
+        Инициализация экземпляра класса.
+
+        Args:
+            db: DBTool - объект, реализующий взаимодействие с БД.
+            parser: SiriustParser - парсер сайта, настройки которого
+                                    используются для парсеров потоков.
+            credentials: list[tuple[str, str]] - пары (почта, пароль).
+            workers: int - количество одновременно обрабатываемых
+                           пользователей (default: 4).
+            batch_size: int - количество пользователей, сохраняемых
+                              в БД за одну транзакцию (default: 50).
+        """
+        self._db = db
+        self._parser = parser
+        self._credentials = credentials
+        self._workers = max(workers, 1)
+        self._batch_size = max(batch_size, 1)
+        self._page_cache = PageCache()
+        self._local = threading.local()
+
+    def _get_parser(self) -> SiriustParser:
+        """Парсер текущего потока с общим кэшем страниц."""
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            parser = self._local.parser = self._parser.clone(self._page_cache)
+        return parser
+
+    def _parse_account(self, email: str, password: str, hashes: dict[str, str]) -> User:
+        """
+        Авторизация и парсинг данных одного пользователя.
+
+        Args:
+            email: str - электронная почта пользователя.
+            password: str - пароль пользователя.
+            hashes: dict[str, str] - отпечатки страниц сохраненных в БД
+                                     товаров пользователя, чтобы не
+                                     разбирать неизменившиеся страницы.
+
+        Returns:
+            Объект класса User с полученными данными.
+        """
+        parser = self._get_parser()
+        parser.log_in(email, password)
+        parser.remember_hashes(hashes)
+        return parser.parse()
+
+    def ingest(self) -> dict[str, Optional[str]]:
+        """
+        Обработка всех пользователей.
+
+        Returns:
+            Словарь, сопоставляющий почте пользователя None в случае
+            успеха или текст ошибки. Частично полученные данные
+            сохраняются, но отмечаются в отчете.
+        """
+        report = {}
+        batch = []
+        # Сессия БД используется только в этом потоке, поэтому потокам
+        # передаются не объекты ORM, а отпечатки страниц товаров.
+        hashes = self._db.get_item_hashes([email for email, _ in self._credentials])
+        with ThreadPoolExecutor(max_workers=self._workers) as pool:
+            futures = {
+                pool.submit(self._parse_account, email, password, hashes.get(email, {})): email
+                for email, password in self._credentials
+            }
+            for future in as_completed(futures):
+                email = futures[future]
+                try:
+                    user = future.result()
+                except Exception as err:
+                    report[email] = str(err) or type(err).__name__
+                    continue
+                batch.append((email, user))
+                report[email] = 'истекло время, получены не все товары' if user.incomplete else None
+                if len(batch) >= self._batch_size:
+                    self._save_batch(batch, report)
+                    batch = []
+        if batch:
+            self._save_batch(batch, report)
+        return report
+
+    def _save_batch(self, batch: list[tuple[str, User]], report: dict[str, Optional[str]]) -> None:
+        """
+        Сохранение пакета пользователей в БД. Ошибка сохранения
+        отмечается в отчете для всех пользователей пакета.
+
+        Args:
+            batch: list[tuple[str, User]] - пары (почта из учетных данных,
+                                            пользователь) для сохранения.
+            report: dict[str, Optional[str]] - отчет о загрузке.
+        """
+        try:
+            self._db.add_or_update_users([user for _, user in batch])
+        except Exception as err:
+            self._db.rollback()
+            for email, _ in batch:
+                report[email] = f'Ошибка сохранения в БД: {err}'
+
+    def run(self) -> None:
+        """Запуск загрузки и вывод отчета."""
+        report = self.ingest()
+        failed = 0
+        for email, _ in self._credentials:
+            error = report.get(email)
+            if error is None:
+                print(f'{email}: успешно')
+            else:
+                failed += 1
+                print(f'{email}: ошибка - {error}')
+        print(f'Обработано пользователей: {len(self._credentials)}, с ошибками: {failed}')
@@ -0,0 +1,121 @@
+"""Хранилище промежуточного состояния парсинга."""
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class CrawlCheckpoint:
+    """
+    Класс, сохраняющий прогресс парсинга избранного пользователя:
+    список ссылок на товары и уже разобранные товары. Если парсинг
+    прервался, следующий запуск для того же пользователя продолжает
+    его с оставшихся товаров. Каждый разобранный товар сохраняется
+    отдельной транзакцией, поэтому прогресс не теряется при
+    аварийном завершении процесса.
+    """
+    __slots__ = ('_connection', '_lock', '_max_age')
+
+    def __init__(self, path: str = 'crawl_state.db', max_age: float = 24 * 60 * 60) -> None:
+        """
+        Инициализация объекта класса.
+
+        Args:
+            path: str - путь к файлу состояния (default: 'crawl_state.db').
+            max_age: float - время в секундах, после которого сохраненный
+                             прогресс считается устаревшим и не
+                             используется (default: сутки).
+        """
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._max_age = max_age
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode = WAL;')
+            self._connection.execute((
+                'CREATE TABLE IF NOT EXISTS Crawls ('
+                'email TEXT PRIMARY KEY, urls TEXT NOT NULL, started REAL NOT NULL);'
+            ))
+            self._connection.execute((
+                'CREATE TABLE IF NOT EXISTS ParsedItems ('
+                'email TEXT NOT NULL, url TEXT NOT NULL, content_hash TEXT NOT NULL, '
+                'data TEXT NOT NULL, PRIMARY KEY (email, url));'
+            ))
+
+    def get_urls(self, email: str) -> Optional[list[str]]:
+        """
+        Получение ссылок на товары незавершенного парсинга.
+
+        Args:
+            email: str - электронная почта пользователя.
+
+        Returns:
+            Список ссылок или None, если незавершенного парсинга нет
+            или он устарел.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT urls, started FROM Crawls WHERE email = ?;', (email,)).fetchone()
+        if row is None or time.time() - row[1] > self._max_age:
+            return None
+        return json.loads(row[0])
+
+    def start(self, email: str, urls: list[str]) -> None:
+        """
+        Начало нового парсинга: сохранение ссылок на товары и
+        удаление прогресса предыдущего парсинга.
+
+        Args:
+            email: str - электронная почта пользователя.
+            urls: list[str] - ссылки на товары из избранного.
+        """
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM ParsedItems WHERE email = ?;', (email,))
+            self._connection.execute(
+                'INSERT OR REPLACE INTO Crawls (email, urls, started) VALUES (?, ?, ?);',
+                (email, json.dumps(urls), time.time()))
+
+    def get_parsed(self, email: str) -> dict[str, tuple[str, Optional[dict]]]:
+        """
+        Получение уже разобранных товаров.
+
+        Args:
+            email: str - электронная почта пользователя.
+
+        Returns:
+            Словарь, сопоставляющий ссылке на товар отпечаток страницы
+            и результат parse_item_page или None, если страница не
+            изменилась с предыдущего парсинга и товар не разбирался.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT url, content_hash, data FROM ParsedItems WHERE email = ?;', (email,)).fetchall()
+        return {url: (content_hash, json.loads(data)) for url, content_hash, data in rows}
+
+    def save_parsed(self, email: str, url: str, content_hash: str, data: Optional[dict]) -> None:
+        """
+        Сохранение разобранного товара.
+
+        Args:
+            email: str - электронная почта пользователя.
+            url: str - ссылка на товар.
+            content_hash: str - отпечаток страницы.
+            data: Optional[dict] - результат parse_item_page или None,
+                                   если страница не изменилась и
+                                   использован ранее полученный товар.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO ParsedItems (email, url, content_hash, data) VALUES (?, ?, ?, ?);',
+                (email, url, content_hash, json.dumps(data, ensure_ascii=False)))
+
+    def finish(self, email: str) -> None:
+        """
+        Завершение парсинга: удаление сохраненного прогресса.
+
+        Args:
+            email: str - электронная почта пользователя.
+        """
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM ParsedItems WHERE email = ?;', (email,))
+            self._connection.execute('DELETE FROM Crawls WHERE email = ?;', (email,))
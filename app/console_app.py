@@ -2,7 +2,7 @@ from getpass import getpass
 from typing import Optional
 from functools import wraps
 from app.base_app import BaseApp
-from app.parser import SiriustParser, AuthorizationError
+from app.parser import SiriustParser, AuthorizationError, ParsingTimeoutError
 from app.db import DBTool
 from app.entities import User
 
@@ -74,7 +74,7 @@ class ConsoleApp(BaseApp):
                 print('Неправильный формат ответа.')
             else:
                 break
-        return self._users[answer - 1]
+        return self._db.get_user(user_id=self._users[answer - 1].id)
 
     @_log(second_message='Вход успешно выполнен.')
     def log_in(self) -> None:
@@ -88,12 +88,13 @@ class ConsoleApp(BaseApp):
                     email = input('Введите почту: ')
                     password = getpass('Введите пароль: ')
                     self._parser.log_in(email, password)
-                except AuthorizationError as err:
-                    print(err)
-                else:
                     print('Парсинг данных...')
                     self._chosen_user = self._parser.parse()
+                except (AuthorizationError, ParsingTimeoutError) as err:
+                    print(err)
+                else:
                     print('Парсинг успешно завершен.')
+                    self._report_incomplete()
                     break
         else:
             self._parser.log_in(self._chosen_user.email, self._chosen_user.password)
@@ -115,6 +116,14 @@ class ConsoleApp(BaseApp):
         в _chosen_user.
         """
         super().update_data()
+        self._report_incomplete()
+
+    def _report_incomplete(self) -> None:
+        """
+        Предупреждение о том, что избранное получено не полностью.
+        """
+        if self._chosen_user.incomplete:
+            print('Истекло время парсинга, получены не все товары.')
 
     def _print_data(self) -> None:
         """
@@ -153,3 +162,5 @@ class ConsoleApp(BaseApp):
                     options[option-1]()
             except ValueError:
                 print('Неправильный формат ответа.')
+            except ParsingTimeoutError as err:
+                print(err)
@@ -1,27 +1,233 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import create_engine, event, func, tuple_
+from sqlalchemy.orm import sessionmaker, selectinload
 from sqlalchemy.sql import text
-from app.entities import Base, User
+from app.entities import Base, User, Item, Review, Store, user_to_item
 from app.singleton import singleton
 
+
+def _encode_bitmap(positions: list[int]) -> bytes:
+    """
+    Упаковка номеров в битовую карту.
+
+    Args:
+        positions: list[int] - номера установленных битов.
+
+    Returns:
+        Битовая карта, где бит n находится в байте n // 8.
+    """
+    bitmap = bytearray(max(positions) // 8 + 1 if positions else 0)
+    for position in positions:
+        bitmap[position // 8] |= 1 << (position % 8)
+    return bytes(bitmap)
+
+
+def _bitmap_has(bitmap: bytes, position: int) -> int:
+    """
+    Проверка бита битовой карты. Регистрируется в SQLite как
+    функция bitmap_has, чтобы запросы по наличию товаров в
+    магазинах выполнялись в БД.
+    """
+    if bitmap is None or position // 8 >= len(bitmap):
+        return 0
+    return (bitmap[position // 8] >> (position % 8)) & 1
+
+
+def _register_functions(dbapi_connection, connection_record) -> None:
+    """Регистрация пользовательских функций в соединении с SQLite."""
+    dbapi_connection.create_function('bitmap_has', 2, _bitmap_has, deterministic=True)
+
+
+class UserCache:
+    """
+    Ограниченный по размеру LRU-кэш пользователей с загруженными
+    избранными товарами и отзывами. Пользователь доступен как по
+    почте, так и по id.
+    """
+    __slots__ = ('_size', '_users', '_ids', 'hits', 'misses', 'evictions')
+
+    def __init__(self, size: int = 1024) -> None:
+        """
+        Инициализация объекта класса.
+
+        Args:
+            size: int - максимальное количество пользователей в кэше
+                        (default: 1024).
+        """
+        self._size = size
+        self._users = OrderedDict()
+        self._ids = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, email: str = None, user_id: int = None) -> Optional[User]:
+        """
+        Получение пользователя из кэша по почте или id.
+
+        Returns:
+            Объект класса User или None, если его нет в кэше.
+        """
+        if user_id is None:
+            user_id = self._ids.get(email)
+        user = self._users.get(user_id)
+        if user is None:
+            self.misses += 1
+            return None
+        self._users.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def put(self, user: User) -> None:
+        """Добавление пользователя в кэш с вытеснением самого давнего."""
+        if self._size <= 0:
+            return
+        self._users[user.id] = user
+        self._users.move_to_end(user.id)
+        self._ids[user.email] = user.id
+        while len(self._users) > self._size:
+            _, evicted = self._users.popitem(last=False)
+            self._ids.pop(evicted.email, None)
+            self.evictions += 1
+
+    def invalidate(self, email: str = None, user_id: int = None) -> None:
+        """Удаление пользователя из кэша по почте или id."""
+        if user_id is None:
+            user_id = self._ids.get(email)
+        user = self._users.pop(user_id, None)
+        if user is not None:
+            self._ids.pop(user.email, None)
+        if email is not None:
+            self._ids.pop(email, None)
+
+    def clear(self) -> None:
+        """Очистка кэша."""
+        self._users.clear()
+        self._ids.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Статистика работы кэша.
+
+        Returns:
+            Словарь с количеством попаданий, промахов, вытеснений
+            и текущим размером кэша.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._users),
+        }
+
+
 @singleton
 class DBTool():
     """Класс, реализующий взаимодействие с БД."""
-    __slots__ = ('_session')
+    __slots__ = ('_session', '_store_ids', '_user_cache')
+
+    def __init__(self, path: str = 'app.db', cache_size: int = 1024) -> None:
+        """
+        Инициализация объекта класса.
 
-    def __init__(self) -> None:
-        """Инициализация объекта класса."""
-        engine = create_engine('sqlite:///app.db')
+        Args:
+            path: str - путь к файлу БД (default: 'app.db').
+            cache_size: int - количество пользователей в кэше чтения;
+                              0 отключает кэш (default: 1024).
+        """
+        engine = create_engine(f'sqlite:///{path}')
+        event.listen(engine, 'connect', _register_functions)
         engine.connect()
+        self._store_ids = None
+        self._user_cache = UserCache(cache_size)
 
-        Session = sessionmaker()
+        # Объекты не сбрасываются после commit: иначе каждое сохранение
+        # помечало бы всех пользователей кэша устаревшими, и первое же
+        # обращение к их атрибутам снова загружало бы их из БД. Все
+        # изменения пользователей проходят через DBTool, который при
+        # записи удаляет их из кэша; единственная запись в обход ORM -
+        # удаление товаров без пользователей, на которые кэш не ссылается.
+        Session = sessionmaker(expire_on_commit=False)
         Session.configure(bind=engine)
         self._session = Session()
 
         Base.metadata.create_all(engine)
+        self._migrate()
         self._session.execute(text('PRAGMA foreign_keys = ON;'))
         self._session.commit()
 
+    def _migrate(self) -> None:
+        """
+        Приведение схемы БД, созданной предыдущими версиями
+        приложения, к текущей.
+        """
+        item_columns = {row[1] for row in self._session.execute(text('PRAGMA table_info(Items);'))}
+        for column, column_type in (('url', 'TEXT'), ('content_hash', 'TEXT'), ('stores_bitmap', 'BLOB')):
+            if column not in item_columns:
+                self._session.execute(text(f'ALTER TABLE Items ADD COLUMN {column} {column_type};'))
+        self._rebuild_user_to_item()
+        connection = self._session.connection()
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+        self._create_reviews_search()
+        self._session.commit()
+
+    def _rebuild_user_to_item(self) -> None:
+        """
+        Пересоздание таблицы user_to_item с составным первичным ключом.
+        SQLite не позволяет добавить первичный ключ в существующую
+        таблицу, поэтому связи переносятся в новую таблицу, а
+        повторяющиеся связи удаляются.
+        """
+        columns = self._session.execute(text('PRAGMA table_info(user_to_item);')).all()
+        if any(column[5] for column in columns):
+            return
+        self._session.execute(text('ALTER TABLE user_to_item RENAME TO user_to_item_old;'))
+        user_to_item.create(self._session.connection())
+        self._session.execute(text((
+            'INSERT INTO user_to_item (user_id, item_id) '
+            'SELECT DISTINCT user_id, item_id FROM user_to_item_old '
+            'WHERE user_id IS NOT NULL AND item_id IS NOT NULL;'
+        )))
+        self._session.execute(text('DROP TABLE user_to_item_old;'))
+
+    def _create_reviews_search(self) -> None:
+        """
+        Создание полнотекстового индекса FTS5 по отзывам и триггеров,
+        поддерживающих его в актуальном состоянии. Если индекс создается
+        для уже заполненной БД, он строится по имеющимся отзывам.
+        """
+        exists = self._session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ReviewsSearch';"
+        )).first()
+        if exists:
+            return
+        self._session.execute(text((
+            'CREATE VIRTUAL TABLE ReviewsSearch USING fts5('
+            "text, author_name, content='Reviews', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2');"
+        )))
+        self._session.execute(text((
+            'CREATE TRIGGER Reviews_ai AFTER INSERT ON Reviews BEGIN '
+            'INSERT INTO ReviewsSearch(rowid, text, author_name) '
+            'VALUES (new.id, new.text, new.author_name); END;'
+        )))
+        self._session.execute(text((
+            'CREATE TRIGGER Reviews_ad AFTER DELETE ON Reviews BEGIN '
+            "INSERT INTO ReviewsSearch(ReviewsSearch, rowid, text, author_name) "
+            "VALUES ('delete', old.id, old.text, old.author_name); END;"
+        )))
+        self._session.execute(text((
+            'CREATE TRIGGER Reviews_au AFTER UPDATE ON Reviews BEGIN '
+            "INSERT INTO ReviewsSearch(ReviewsSearch, rowid, text, author_name) "
+            "VALUES ('delete', old.id, old.text, old.author_name); "
+            'INSERT INTO ReviewsSearch(rowid, text, author_name) '
+            'VALUES (new.id, new.text, new.author_name); END;'
+        )))
+        self._session.execute(text("INSERT INTO ReviewsSearch(ReviewsSearch) VALUES ('rebuild');"))
+
     def add_or_update_user(self, user: User) -> None:
         """
         Добавляет пользователя в БД или обновляет
@@ -31,22 +237,361 @@ class DBTool():
             user: User - пользователь, для добавления/
                          обновления в БД.
         """
+        self._encode_stores(user.favorite_items)
         old_user_data = self._session.query(User).filter_by(email=user.email).first()
+        self._restore_unchanged_items(user, old_user_data)
         if old_user_data:
             self._update_user(user, old_user_data)
         else:
             self._session.add(user)
             self._session.commit()
 
+    def add_or_update_users(self, users: list[User]) -> None:
+        """
+        Добавляет пользователей в БД или обновляет имеющиеся о них
+        данные одной транзакцией.
+
+        Args:
+            users: list[User] - пользователи для добавления/
+                                обновления в БД.
+        """
+        self._encode_stores([item for user in users for item in user.favorite_items])
+        old_users = {
+            user.email: user
+            for user in self._session.query(User)
+                                     .options(selectinload(User.favorite_items))
+                                     .filter(User.email.in_([u.email for u in users]))
+        }
+        for user in users:
+            self._user_cache.invalidate(email=user.email)
+            old_user_data = old_users.get(user.email)
+            self._restore_unchanged_items(user, old_user_data)
+            if old_user_data:
+                old_user_data.copy_attrs(user)
+            else:
+                self._session.add(user)
+                old_users[user.email] = user
+        self._session.commit()
+        self._delete_orphan_items()
+
+    def _restore_unchanged_items(self, user: User, old_user_data: Optional[User]) -> None:
+        """
+        Замена товаров, страницы которых не изменились (Item.unchanged),
+        на сохраненные в БД товары с теми же ссылками, чтобы их строки
+        и отзывы не удалялись и не вставлялись заново. Товар, которого
+        уже нет в избранном пользователя, отбрасывается.
+
+        Args:
+            user: User - новые пользовательские данные.
+            old_user_data: Optional[User] - сохраненные данные или None.
+        """
+        if not any(item.unchanged for item in user.favorite_items):
+            return
+        old_items = {item.url: item for item in old_user_data.favorite_items} if old_user_data else {}
+        user.favorite_items = [old_items[item.url] if item.unchanged else item
+                               for item in user.favorite_items
+                               if not item.unchanged or item.url in old_items]
+
+    def rollback(self) -> None:
+        """Откат незавершенной транзакции после ошибки."""
+        self._session.rollback()
+        self._store_ids = None
+        self._user_cache.clear()
+
+    def get_user(self, email: str = None, user_id: int = None) -> Optional[User]:
+        """
+        Получение пользователя по почте или id. Пользователь
+        загружается вместе с избранными товарами и отзывами и
+        сохраняется в кэше, поэтому повторное чтение не обращается
+        к БД.
+
+        Args:
+            email: str - электронная почта пользователя (default: None).
+            user_id: int - id пользователя (default: None).
+
+        Returns:
+            Объект класса User или None, если пользователь не найден.
+        """
+        user = self._user_cache.get(email=email, user_id=user_id)
+        if user is not None:
+            return user
+        query = self._hydrated_users()
+        if user_id is not None:
+            query = query.filter_by(id=user_id)
+        else:
+            query = query.filter_by(email=email)
+        user = query.first()
+        if user is not None:
+            self._user_cache.put(user)
+        return user
+
+    def _hydrated_users(self):
+        """Запрос пользователей с загрузкой избранных товаров и отзывов."""
+        return self._session.query(User)\
+            .options(selectinload(User.favorite_items).selectinload(Item.reviews))\
+            .populate_existing()
+
+    def cache_stats(self) -> dict[str, int]:
+        """
+        Статистика кэша пользователей.
+
+        Returns:
+            Словарь с количеством попаданий, промахов, вытеснений
+            и текущим размером кэша.
+        """
+        return self._user_cache.stats()
+
     def get_users(self) -> list[User]:
         """
-        Получение списка всех пользовательских данных.
+        Получение списка всех пользовательских данных. Избранные
+        товары не загружаются и не попадают в кэш: для выбранного
+        пользователя их загружает get_user.
 
         Returns:
             Список объектов класса User.
         """
         return self._session.query(User).all()
 
+    def get_users_page(self,
+                       after_id: int = None,
+                       limit: int = 50,
+                       email_prefix: str = None,
+                       city: str = None) -> list[User]:
+        """
+        Постраничное получение пользователей в порядке возрастания id.
+
+        Args:
+            after_id: int - id последнего пользователя предыдущей
+                            страницы (default: None - первая страница).
+            limit: int - размер страницы (default: 50).
+            email_prefix: str - начало почты (default: None).
+            city: str - город (default: None).
+
+        Returns:
+            Список объектов класса User.
+        """
+        query = self._session.query(User)
+        if after_id is not None:
+            query = query.filter(User.id > after_id)
+        if email_prefix:
+            # Сравнение по диапазону, в отличие от LIKE, использует
+            # индекс по почте.
+            query = query.filter(User.email >= email_prefix,
+                                 User.email < email_prefix + '\U0010ffff')
+        if city is not None:
+            query = query.filter(User.city == city)
+        return query.order_by(User.id).limit(limit).all()
+
+    def get_items_page(self,
+                       user: User = None,
+                       after: Optional[tuple] = None,
+                       limit: int = 50,
+                       order_by: str = 'id',
+                       descending: bool = False,
+                       min_rating: float = None,
+                       max_rating: float = None,
+                       min_stores: int = None,
+                       max_stores: int = None) -> list[Item]:
+        """
+        Постраничное получение товаров с фильтрацией и сортировкой.
+
+        Args:
+            user: User - если указан, возвращаются только избранные
+                         товары этого пользователя (default: None).
+            after: tuple - курсор: пара (значение поля сортировки, id)
+                           последнего товара предыдущей страницы
+                           (default: None - первая страница).
+            limit: int - размер страницы (default: 50).
+            order_by: str - поле сортировки: 'id', 'rating' или
+                            'number_of_stores' (default: 'id').
+            descending: bool - сортировка по убыванию (default: False).
+            min_rating: float - минимальный рейтинг (default: None).
+            max_rating: float - максимальный рейтинг (default: None).
+            min_stores: int - минимальное количество магазинов
+                              (default: None).
+            max_stores: int - максимальное количество магазинов
+                              (default: None).
+
+        Returns:
+            Список объектов класса Item.
+
+        Raises:
+            ValueError, если указано неизвестное поле сортировки.
+        """
+        sort_columns = {
+            'id': Item.id,
+            'rating': Item.rating,
+            'number_of_stores': Item.number_of_stores,
+        }
+        if order_by not in sort_columns:
+            raise ValueError(f'Неизвестное поле сортировки: {order_by}.')
+        sort_column = sort_columns[order_by]
+
+        query = self._session.query(Item)
+        if user is not None:
+            query = query.join(user_to_item, user_to_item.c.item_id == Item.id)\
+                         .filter(user_to_item.c.user_id == user.id)
+        if min_rating is not None:
+            query = query.filter(Item.rating >= min_rating)
+        if max_rating is not None:
+            query = query.filter(Item.rating <= max_rating)
+        if min_stores is not None:
+            query = query.filter(Item.number_of_stores >= min_stores)
+        if max_stores is not None:
+            query = query.filter(Item.number_of_stores <= max_stores)
+
+        if order_by == 'id':
+            if after is not None:
+                query = query.filter(Item.id < after[1] if descending else Item.id > after[1])
+            order = [Item.id.desc() if descending else Item.id]
+        else:
+            if after is not None:
+                key, cursor = tuple_(sort_column, Item.id), tuple_(*after)
+                query = query.filter(key < cursor if descending else key > cursor)
+            order = [sort_column.desc(), Item.id.desc()] if descending else [sort_column, Item.id]
+        return query.order_by(*order).limit(limit).all()
+
+    def get_item_hashes(self, emails: list[str]) -> dict[str, dict[str, str]]:
+        """
+        Получение отпечатков страниц избранных товаров пользователей.
+        Используется для передачи парсерам в других потоках данных о
+        ранее полученных товарах без объектов ORM.
+
+        Args:
+            emails: list[str] - почты пользователей.
+
+        Returns:
+            Словарь, сопоставляющий почте пользователя словарь
+            {ссылка на товар: отпечаток страницы}.
+        """
+        hashes = {}
+        for start in range(0, len(emails), 500):
+            rows = self._session.query(User.email, Item.url, Item.content_hash)\
+                .join(User.favorite_items)\
+                .filter(User.email.in_(emails[start:start + 500]),
+                        Item.url.isnot(None),
+                        Item.content_hash.isnot(None))
+            for email, url, content_hash in rows:
+                hashes.setdefault(email, {})[url] = content_hash
+        return hashes
+
+    def _get_store_id(self, name: str) -> int:
+        """
+        Получение номера магазина по названию с добавлением
+        отсутствующего магазина в справочник.
+
+        Args:
+            name: str - название магазина.
+
+        Returns:
+            Номер магазина.
+        """
+        if self._store_ids is None:
+            self._store_ids = {store.name: store.id for store in self._session.query(Store)}
+        store_id = self._store_ids.get(name)
+        if store_id is None:
+            store = Store(name=name)
+            self._session.add(store)
+            self._session.flush()
+            store_id = self._store_ids[name] = store.id
+        return store_id
+
+    def _encode_stores(self, items: list[Item]) -> None:
+        """
+        Заполнение битовой карты магазинов для товаров, полученных
+        парсером. Товары, загруженные из БД, не изменяются.
+
+        Args:
+            items: list[Item] - товары для сохранения.
+        """
+        for item in items:
+            if item.available_stores is not None:
+                item.stores_bitmap = _encode_bitmap(
+                    [self._get_store_id(name) for name in item.available_stores])
+                item.available_stores = None
+
+    def get_items_in_store(self, user: User, store_name: str) -> list[Item]:
+        """
+        Получение избранных товаров пользователя, имеющихся в
+        наличии в указанном магазине.
+
+        Args:
+            user: User - сохраненный в БД пользователь.
+            store_name: str - название магазина.
+
+        Returns:
+            Список объектов класса Item.
+        """
+        store = self._session.query(Store).filter_by(name=store_name).first()
+        if store is None:
+            return []
+        return self._session.query(Item)\
+            .join(user_to_item, user_to_item.c.item_id == Item.id)\
+            .filter(user_to_item.c.user_id == user.id,
+                    func.bitmap_has(Item.stores_bitmap, store.id) == 1)\
+            .all()
+
+    def get_stores_by_coverage(self, user: User, limit: int = 10) -> list[tuple[str, int]]:
+        """
+        Получение магазинов, в которых в наличии больше всего
+        избранных товаров пользователя.
+
+        Args:
+            user: User - сохраненный в БД пользователь.
+            limit: int - максимальное количество магазинов (default: 10).
+
+        Returns:
+            Список пар (название магазина, количество товаров),
+            упорядоченный по убыванию количества товаров.
+        """
+        return self._session.execute(text((
+            'SELECT Stores.name, COUNT(*) AS items_count '
+            'FROM user_to_item '
+            'JOIN Items ON Items.id = user_to_item.item_id '
+            'JOIN Stores ON bitmap_has(Items.stores_bitmap, Stores.id) '
+            'WHERE user_to_item.user_id = :user_id '
+            'GROUP BY Stores.id '
+            'ORDER BY items_count DESC, Stores.name '
+            'LIMIT :limit;'
+        )), {'user_id': user.id, 'limit': limit}).all()
+
+    def search_reviews(self, query: str, limit: int = 20, raw: bool = False) -> list[tuple[Review, str]]:
+        """
+        Полнотекстовый поиск по тексту и авторам отзывов. Отзыв
+        подходит, если содержит все слова запроса.
+
+        Args:
+            query: str - поисковый запрос.
+            limit: int - максимальное количество результатов
+                         (default: 20).
+            raw: bool - передать запрос в FTS5 без изменений, чтобы
+                        использовать синтаксис FTS5 (OR, NEAR, префиксы)
+                        (default: False).
+
+        Returns:
+            Список пар (отзыв, фрагмент текста с выделенными
+            совпадениями), упорядоченный по релевантности.
+        """
+        if not raw:
+            # Каждое слово берется в кавычки, чтобы дефисы, двоеточия и
+            # кавычки в запросе (например, 'iphone-11') не разбирались
+            # как синтаксис FTS5.
+            query = ' '.join('"' + token.replace('"', '""') + '"' for token in query.split())
+            if not query:
+                return []
+        rows = self._session.execute(text((
+            "SELECT rowid, snippet(ReviewsSearch, -1, '[', ']', '...', 16) "
+            'FROM ReviewsSearch WHERE ReviewsSearch MATCH :query '
+            'ORDER BY rank LIMIT :limit;'
+        )), {'query': query, 'limit': limit}).all()
+        if not rows:
+            return []
+        reviews = {
+            review.id: review
+            for review in self._session.query(Review).filter(Review.id.in_([row[0] for row in rows]))
+        }
+        return [(reviews[review_id], snippet) for review_id, snippet in rows if review_id in reviews]
+
     def _update_user(self, new_user_data: User, old_user_data: User) -> None:
         """
         Обновление данных о пользователе.
@@ -55,8 +600,13 @@ class DBTool():
             new_user_data: User - новые пользовательские данные.
             old_user_data: User - данные, которые нужно обновить.
         """
+        self._user_cache.invalidate(email=old_user_data.email, user_id=old_user_data.id)
         old_user_data.copy_attrs(new_user_data)
         self._session.commit()
+        self._delete_orphan_items()
+
+    def _delete_orphan_items(self) -> None:
+        """Удаление товаров, не относящихся ни к одному пользователю."""
         self._session.execute(text((
             'DELETE FROM Items '
             'WHERE id NOT IN (SELECT item_id FROM user_to_item);'
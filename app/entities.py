@@ -1,5 +1,5 @@
 """Описание сущностей и структуры БД."""
-from sqlalchemy import Table, Column, Text, Integer, ForeignKey, REAL
+from sqlalchemy import Table, Column, Index, Text, Integer, ForeignKey, REAL, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, mapped_column
 
@@ -16,16 +16,40 @@ Base = declarative_base()
 user_to_item = Table(
     'user_to_item',
     Base.metadata,
-    Column('user_id', Integer, ForeignKey('Users.id', ondelete='CASCADE')),
-    Column('item_id', Integer, ForeignKey('Items.id', ondelete='CASCADE'))
+    Column('user_id', Integer, ForeignKey('Users.id', ondelete='CASCADE'), primary_key=True),
+    Column('item_id', Integer, ForeignKey('Items.id', ondelete='CASCADE'), primary_key=True),
+    Index('ix_user_to_item_item_id', 'item_id')
 )
 
+class Store(Base):
+    """
+    Класс, описывающий справочник магазинов. Номер магазина
+    является номером бита в Item.stores_bitmap.
+    """
+    __tablename__ = 'Stores'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(Text, nullable=False, unique=True)
+
+
 class Item(Base):
     """
     Класс, хранящий данные о товаре и описание
     соотетствующей таблицы в БД.
+
+    Атрибут available_stores не хранится в БД: парсер записывает
+    в него названия магазинов, в которых товар в наличии, а DBTool
+    при сохранении преобразует их в stores_bitmap. Атрибут unchanged
+    также не хранится в БД: парсер устанавливает его у товара, от
+    которого известны только ссылка и отпечаток неизменившейся
+    страницы, а DBTool при сохранении заменяет такой товар
+    сохраненным.
     """
     __tablename__ = 'Items'
+    __table_args__ = (
+        Index('ix_items_rating_id', 'rating', 'id'),
+        Index('ix_items_number_of_stores_id', 'number_of_stores', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(Text, nullable=False)
@@ -33,6 +57,11 @@ class Item(Base):
     wholesale_price = Column(Text, nullable=False)
     rating = Column(REAL, nullable=False)
     number_of_stores = Column(Integer, nullable=False)
+    url = Column(Text)
+    content_hash = Column(Text)
+    stores_bitmap = Column(LargeBinary)
+    available_stores = None
+    unchanged = False
     reviews = relationship(
         'Review',
         passive_deletes=True
@@ -64,7 +93,7 @@ class Review(Base):
     author_name = Column(Text, nullable=False)
     score = Column(Integer, nullable=False)
     text = Column(Text, nullable=False)
-    item_id = mapped_column(ForeignKey('Items.id', ondelete='CASCADE'))
+    item_id = mapped_column(ForeignKey('Items.id', ondelete='CASCADE'), index=True)
 
     def __str__(self) -> str:
         return (
@@ -78,6 +107,9 @@ class User(Base):
     """
     Класс, хранящий пользовательские данные и 
     описание соответствующей таблицы.
+
+    Атрибут incomplete не хранится в БД: парсер устанавливает его,
+    если избранное получено не полностью.
     """
     __tablename__ = 'Users'
 
@@ -86,16 +118,19 @@ class User(Base):
     password = Column(Text, nullable=False)
     first_name = Column(Text, nullable=False)
     last_name = Column(Text, nullable=False)
-    city = Column(Text, nullable=False)
+    city = Column(Text, nullable=False, index=True)
     favorite_items = relationship(
         'Item',
         secondary=user_to_item,
         passive_deletes=True
     )
+    incomplete = False
     
     def copy_attrs(self, new_user_data) -> None:
         """
-        Копирование атрибутов указанного объекта.
+        Копирование атрибутов указанного объекта. Если избранное
+        объекта получено не полностью, оно дополняет имеющееся,
+        а не заменяет его.
 
         Args:
             new_user_data: User - объект у которого копируются
@@ -106,7 +141,12 @@ class User(Base):
         self.first_name = new_user_data.first_name
         self.last_name = new_user_data.last_name
         self.city = new_user_data.city
-        self.favorite_items = new_user_data.favorite_items
+        if new_user_data.incomplete:
+            new_urls = {item.url for item in new_user_data.favorite_items}
+            self.favorite_items = list(new_user_data.favorite_items) + [
+                item for item in self.favorite_items if item.url is None or item.url not in new_urls]
+        else:
+            self.favorite_items = new_user_data.favorite_items
 
     def __str__(self) -> str:
         return (
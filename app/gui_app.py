@@ -2,7 +2,7 @@ import customtkinter as ctk
 from functools import wraps
 from tkinter import NORMAL, DISABLED
 from app.db import DBTool
-from app.parser import SiriustParser, AuthorizationError
+from app.parser import SiriustParser, AuthorizationError, ParsingTimeoutError
 from app.base_app import BaseApp
 
 ctk.set_appearance_mode("dark")
@@ -152,7 +152,7 @@ class GuiApp(BaseApp):
         Заполняет поля для ввода почты и пароля данными, полученными
         из БД.
         """
-        self._chosen_user = self._users[self._user_option_menu.get()]
+        self._chosen_user = self._db.get_user(email=self._user_option_menu.get())
 
         self._email_entry.delete(0, ctk.END)
         self._email_entry.insert(0, self._chosen_user.email)
@@ -236,15 +236,22 @@ class GuiApp(BaseApp):
         super().save_in_bd()
 
     @_loading()
-    @_log('Парсинг успешно завершен', 'Обновление данных')
     def update_data(self) -> None:
         """
         Повторный парсинг сайта и сохранение полученной информации
         в _chosen_user, после чего основная страница программы заново
         заполняется данными.
         """
-        super().update_data()
+        try:
+            super().update_data()
+        except ParsingTimeoutError as err:
+            GuiApp.show_message(err, 'Ошибка обновления данных')
+            return
         self._fill_main_frame()
+        if self._chosen_user.incomplete:
+            GuiApp.show_message('Истекло время парсинга, получены не все товары.', 'Обновление данных')
+        else:
+            GuiApp.show_message('Парсинг успешно завершен', 'Обновление данных')
 
     @_loading()
     def log_in(self) -> None:
@@ -260,12 +267,17 @@ class GuiApp(BaseApp):
         if self._chosen_user is None:
             try:
                 self._parser.log_in(email, password)
+                self._chosen_user = self._parser.parse()
             except AuthorizationError as err:
                 GuiApp.show_message(err, 'Ошибка авторизации')
-            else:
-                self._chosen_user = self._parser.parse()
-                if remember:
-                    self._db.add_or_update_user(self._chosen_user)
+                return
+            except ParsingTimeoutError as err:
+                GuiApp.show_message(err, 'Ошибка парсинга')
+                return
+            if self._chosen_user.incomplete:
+                GuiApp.show_message('Истекло время парсинга, получены не все товары.', 'Авторизация')
+            if remember:
+                self._db.add_or_update_user(self._chosen_user)
         else:
             self._parser.log_in(self._chosen_user.email, self._chosen_user.password)
         self._fill_main_frame()
@@ -1,85 +1,611 @@
+import hashlib
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 import requests
 from bs4 import BeautifulSoup
+from app.archive import ResponseArchive
+from app.checkpoint import CrawlCheckpoint
 from app.entities import Item, User, Review
 
+
+def parse_item_page(page: tuple[str, str, bytes]) -> tuple[str, str, dict]:
+    """
+    Разбирает страницу товара. Функция вынесена на уровень модуля
+    и работает только с сериализуемыми данными, чтобы ее можно было
+    выполнять в пуле процессов.
+
+    Args:
+        page: tuple[str, str, bytes] - ссылка на страницу товара,
+                                       отпечаток страницы и ее
+                                       содержимое.
+
+    Returns:
+        Ссылка, отпечаток и словарь с полями товара, где отзывы
+        представлены списком словарей.
+    """
+    url, content_hash, content = page
+    html = BeautifulSoup(content, 'html.parser')
+
+    name_tag = html.find('h1', class_='ty-product-block-title')
+    prices_tags = html.find('div', class_='col')\
+                      .find_all('span', class_='ty-price-num', id=True)
+
+    rating_tag = html.find('div', class_='ty-discussion__rating-wrapper')
+    full_score_stars = rating_tag.find_all('i', class_='ty-stars__icon ty-icon-star')
+    half_score_star = rating_tag.find('i', class_='ty-stars__icon ty-icon-star-half')
+
+    review_tags = html.find_all('div', class_='ty-discussion-post__content ty-mb-l')
+    reviews = []
+    for review_tag in review_tags:
+        reviews.append({
+            'author_name': review_tag.find('span', class_='ty-discussion-post__author').text,
+            'score': len(review_tag.find_all('i', class_='ty-stars__icon ty-icon-star')),
+            'text': review_tag.find('div', class_='ty-discussion-post__message').text
+        })
+
+    list_of_stores = [x for x in html.find_all('div', class_='ty-product-feature')\
+                        if 'отсутствует' not in x.find('div', class_='ty-product-feature__value').text]
+    # Первый блок ty-product-feature не относится к магазинам,
+    # поэтому он не учитывается и в number_of_stores.
+    store_names = []
+    for store_tag in list_of_stores[1:]:
+        label_tag = store_tag.find(class_='ty-product-feature__label')
+        if label_tag is not None:
+            store_names.append(label_tag.text.strip().rstrip(':').strip())
+
+    return url, content_hash, {
+        'name': name_tag.text,
+        'retail_price': prices_tags[0].text,
+        'wholesale_price': prices_tags[1].text,
+        'rating': len(full_score_stars) + 0.5 if half_score_star else len(full_score_stars),
+        'number_of_stores': len(list_of_stores) - 1,
+        'available_stores': store_names,
+        'reviews': reviews
+    }
+
+
+def parse_item_pages(pages: list[tuple[str, str, bytes]]) -> list[tuple[str, str, dict]]:
+    """
+    Разбирает несколько страниц товаров за один вызов, чтобы
+    уменьшить накладные расходы на передачу данных в пул процессов.
+
+    Args:
+        pages: list[tuple[str, str, bytes]] - страницы в формате
+                                              parse_item_page.
+
+    Returns:
+        Список результатов parse_item_page.
+    """
+    return [parse_item_page(page) for page in pages]
+
+
+class PageCache:
+    """
+    Общий для нескольких парсеров кэш разобранных страниц товаров.
+    Позволяет загружать и разбирать страницу, встречающуюся у
+    нескольких пользователей, только один раз, даже если ее
+    одновременно запрашивают несколько потоков. Хранится не
+    содержимое страниц, а отпечаток и результат parse_item_page,
+    поэтому объем кэша не зависит от размера страниц.
+    """
+    __slots__ = ('_lock', '_pages')
+
+    def __init__(self) -> None:
+        """Инициализация объекта класса."""
+        self._lock = threading.Lock()
+        self._pages = {}
+
+    def get(self, url: str, load) -> tuple[str, str, dict]:
+        """
+        Получение разобранной страницы из кэша или ее загрузка.
+
+        Args:
+            url: str - ссылка на страницу.
+            load - функция, загружающая и разбирающая страницу по
+                   ссылке; вызывается только первым запросившим
+                   страницу потоком.
+
+        Returns:
+            Результат parse_item_page.
+        """
+        with self._lock:
+            future = self._pages.get(url)
+            owner = future is None
+            if owner:
+                future = self._pages[url] = Future()
+        if owner:
+            try:
+                future.set_result(load(url))
+            except Exception as err:
+                with self._lock:
+                    del self._pages[url]
+                future.set_exception(err)
+        return future.result()
+
+
 class SiriustParser:
     """
     Класс парсера, разбирающего сайт siriust.ru.
     """
-    __slots__ = ('_headers', '_session', '_password')
+    __slots__ = ('_headers', '_session', '_email', '_password', '_known_items',
+                 '_known_hashes',
+                 '_fetch_workers', '_parse_workers', '_chunksize',
+                 '_archive', '_replay', '_replay_at', '_page_cache',
+                 '_checkpoint', '_deadline', '_cpu_pool', '_run_deadline')
+
+    # Ограничение времени одного запроса в секундах, чтобы зависший
+    # сервер не останавливал парсинг.
+    _REQUEST_TIMEOUT = 30
+
+    _PROFILE_URL = 'https://siriust.ru/profiles-update/'
+    _WISHLIST_URL = 'https://siriust.ru/wishlist/'
 
-    def __init__(self, headers: dict = None) -> None:
+    # Границы участка страницы товара, по которому считается отпечаток.
+    # Шапка и подвал сайта содержат меняющиеся от запроса к запросу
+    # данные (токены, корзина), поэтому в отпечаток не входят.
+    _FINGERPRINT_START = b'ty-product-block-title'
+    _FINGERPRINT_END_MARKERS = (
+        b'ty-discussion-post__message',
+        b'ty-product-feature__value',
+        b'ty-price-num',
+    )
+
+    def __init__(self,
+                 headers: dict = None,
+                 fetch_workers: int = 1,
+                 parse_workers: int = 0,
+                 chunksize: int = 1,
+                 archive: ResponseArchive = None,
+                 replay: bool = False,
+                 replay_at: float = None,
+                 page_cache: PageCache = None,
+                 checkpoint: CrawlCheckpoint = None,
+                 deadline: float = None,
+                 cpu_pool: ProcessPoolExecutor = None) -> None:
         """
         Инициализация объекта класса.
 
         Args:
             headers: dict - заголовки отправляемых парсером
                             запросов.
+            fetch_workers: int - количество потоков, загружающих
+                                 страницы товаров (default: 1).
+            parse_workers: int - количество процессов, разбирающих
+                                 страницы товаров; при 0 разбор идет
+                                 в текущем процессе (default: 0).
+            chunksize: int - количество страниц, передаваемых
+                             процессу за раз (default: 1).
+            archive: ResponseArchive - архив, в который записываются
+                                       загруженные страницы (default: None).
+            replay: bool - режим воспроизведения: страницы берутся из
+                           archive, сеть не используется (default: False).
+            replay_at: float - в режиме воспроизведения используются версии
+                               страниц не новее указанного момента
+                               (default: None - последние версии).
+            page_cache: PageCache - общий с другими парсерами кэш разобранных
+                                    страниц товаров (default: None).
+            checkpoint: CrawlCheckpoint - хранилище прогресса, позволяющее
+                                          продолжить прерванный парсинг
+                                          (default: None).
+            deadline: float - ограничение времени парсинга в секундах;
+                              по его истечении parse возвращает частичный
+                              результат (default: None).
+            cpu_pool: ProcessPoolExecutor - пул процессов разбора, общий
+                                            с другим парсером; если не
+                                            указан и parse_workers > 0,
+                                            создается новый (default: None).
         """
+        if replay and archive is None:
+            raise ValueError('Для режима воспроизведения нужен архив.')
         if headers is None:
             headers = {
                 'user-agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/103.0.0.0 Safari/537.36',
                 'accept': '*/*'
             }
         self._headers = headers
+        self._known_items = {}
+        self._known_hashes = {}
+        self._fetch_workers = max(fetch_workers, 1)
+        self._parse_workers = max(parse_workers, 0)
+        self._chunksize = max(chunksize, 1)
+        self._archive = archive
+        self._replay = replay
+        self._replay_at = replay_at
+        self._page_cache = page_cache
+        self._checkpoint = checkpoint
+        self._deadline = deadline
+        self._run_deadline = None
+        if cpu_pool is None and self._parse_workers:
+            # Процессы пула порождаются через forkserver/spawn, а не fork:
+            # к моменту первого разбора в процессе уже работают потоки
+            # загрузки, и fork такого процесса может привести к
+            # взаимной блокировке.
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            cpu_pool = ProcessPoolExecutor(max_workers=self._parse_workers,
+                                           mp_context=multiprocessing.get_context(start_method))
+        self._cpu_pool = cpu_pool
+
+    def close(self) -> None:
+        """Завершение работы пула процессов разбора."""
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(cancel_futures=True)
+
+    def clone(self, page_cache: PageCache = None) -> 'SiriustParser':
+        """
+        Создание парсера с теми же настройками, но своей сессией,
+        например, для работы с несколькими пользователями в разных
+        потоках. Пул процессов разбора у парсеров общий.
+
+        Args:
+            page_cache: PageCache - кэш разобранных страниц нового парсера
+                                    (default: None - кэш текущего).
+
+        Returns:
+            Новый объект класса SiriustParser.
+        """
+        return SiriustParser(
+            headers=self._headers,
+            fetch_workers=self._fetch_workers,
+            parse_workers=self._parse_workers,
+            chunksize=self._chunksize,
+            archive=self._archive,
+            replay=self._replay,
+            replay_at=self._replay_at,
+            page_cache=page_cache if page_cache is not None else self._page_cache,
+            checkpoint=self._checkpoint,
+            deadline=self._deadline,
+            cpu_pool=self._cpu_pool)
+
+    def remember_items(self, items: list[Item]) -> None:
+        """
+        Запоминает ранее полученные товары, чтобы не разбирать
+        повторно неизменившиеся страницы.
+
+        Args:
+            items: list[Item] - товары с заполненными url и
+                                content_hash.
+        """
+        for item in items:
+            if item.url and item.content_hash:
+                self._known_items[item.url] = item
+
+    def remember_hashes(self, hashes: dict[str, str]) -> None:
+        """
+        Запоминает отпечатки страниц ранее полученных товаров, когда
+        сами товары недоступны, например, в другом потоке. Для
+        неизменившейся страницы возвращается товар только со ссылкой
+        и отпечатком, отмеченный как unchanged, который DBTool при
+        сохранении заменяет сохраненным товаром.
+
+        Args:
+            hashes: dict[str, str] - словарь {ссылка на товар:
+                                     отпечаток страницы}.
+        """
+        self._known_hashes.update(hashes)
+
+    @classmethod
+    def _fingerprint(cls, content: bytes) -> str:
+        """
+        Вычисляет отпечаток значимой части страницы товара.
+
+        Args:
+            content: bytes - содержимое страницы.
+
+        Returns:
+            Строка с sha256 от участка страницы, содержащего
+            данные о товаре.
+        """
+        start = content.find(cls._FINGERPRINT_START)
+        if start == -1:
+            return hashlib.sha256(content).hexdigest()
+        end = max(content.rfind(marker) for marker in cls._FINGERPRINT_END_MARKERS)
+        end = content.find(b'</div>', end) if end > start else -1
+        region = content[start:end] if end != -1 else content[start:]
+        return hashlib.sha256(region).hexdigest()
 
-    def _parse_item(self, url: str) -> Item:
+    def _get(self, url: str, headers: dict = None, per_account: bool = False) -> bytes:
         """
-        Парсит страницу товара.
+        Загрузка страницы с сайта или, в режиме воспроизведения, из архива.
+        Загруженные с сайта страницы записываются в архив, если он задан.
+
+        Args:
+            url: str - ссылка на страницу.
+            headers: dict - заголовки запроса (default: None).
+            per_account: bool - содержимое страницы зависит от пользователя,
+                                поэтому в архиве она хранится отдельно для
+                                каждой почты (default: False).
+
+        Returns:
+            Содержимое страницы.
+        """
+        key = f'{url}#{self._email}' if per_account else url
+        if self._replay:
+            return self._archive.get(key, self._replay_at)
+        timeout = self._REQUEST_TIMEOUT
+        if self._run_deadline is not None:
+            left = self._run_deadline - time.monotonic()
+            if left <= 0:
+                raise FuturesTimeoutError
+            timeout = min(timeout, left)
+        try:
+            content = self._session.get(url, headers=headers, timeout=timeout).content
+        except requests.Timeout as err:
+            if timeout < self._REQUEST_TIMEOUT:
+                # Таймаут запроса выставлен по deadline: время парсинга истекло.
+                raise FuturesTimeoutError from err
+            raise
+        if self._archive is not None:
+            self._archive.put(key, content)
+        return content
+
+    def _fetch_page(self, url: str) -> tuple[str, bytes]:
+        """
+        Загружает страницу товара.
 
         Args:
             url: str - ссылка на страницу товара.
 
         Returns:
-            Объект класса Item с данными, полученными в ходе парсинга
-            страница товара.
-        """
-        response = self._session.get(url)
-        html = BeautifulSoup(response.content, 'html.parser')
-
-        name_tag = html.find('h1', class_='ty-product-block-title')
-        prices_tags = html.find('div', class_='col')\
-                          .find_all('span', class_='ty-price-num', id=True)
-
-        rating_tag = html.find('div', class_='ty-discussion__rating-wrapper')
-        full_score_stars = rating_tag.find_all('i', class_='ty-stars__icon ty-icon-star')
-        half_score_star = rating_tag.find('i', class_='ty-stars__icon ty-icon-star-half')
-
-        review_tags = html.find_all('div', class_='ty-discussion-post__content ty-mb-l')
-        reviews = []
-        for review_tag in review_tags:
-            reviews.append(
-                Review(
-                    author_name = review_tag.find('span', class_='ty-discussion-post__author').text,
-                    score = len(review_tag.find_all('i', class_='ty-stars__icon ty-icon-star')),
-                    text = review_tag.find('div', class_='ty-discussion-post__message').text
-                )
-            )
-
-        list_of_stores = [x for x in html.find_all('div', class_='ty-product-feature')\
-                            if 'отсутствует' not in x.find('div', class_='ty-product-feature__value').text]
-
-        return Item(
-            name = name_tag.text,
-            retail_price = prices_tags[0].text,
-            wholesale_price = prices_tags[1].text,
-            rating = len(full_score_stars) + 0.5 if half_score_star else len(full_score_stars),
-            number_of_stores = len(list_of_stores) - 1,
-            reviews = reviews)
-
-    def _get_favorite_items(self) -> list[Item]:
-        """
-        Получение списка избранных товаров пользователя.
+            Ссылка и содержимое страницы.
+        """
+        return url, self._get(url)
+
+    def _load_shared_page(self, url: str) -> tuple[str, str, dict]:
+        """
+        Загружает и разбирает страницу товара через общий кэш
+        разобранных страниц.
+
+        Args:
+            url: str - ссылка на страницу товара.
 
         Returns:
-            Список объектов класса Item.
+            Результат parse_item_page.
         """
-        response = self._session.get('https://siriust.ru/wishlist/', headers=self._headers)
-        html = BeautifulSoup(response.content, 'html.parser')
-        items = []
-        for item in html.find_all('div', class_='ty-grid-list__item-name'):
-            items.append(self._parse_item(item.a['href']))
-        return items
+        def load(url: str) -> tuple[str, str, dict]:
+            _, content = self._fetch_page(url)
+            page = (url, self._fingerprint(content), content)
+            if self._cpu_pool is not None:
+                return self._cpu_pool.submit(parse_item_page, page).result()
+            return parse_item_page(page)
+        return self._page_cache.get(url, load)
+
+    def _get_known_item(self, url: str, content_hash: str) -> Item:
+        """
+        Поиск ранее полученного товара с тем же отпечатком страницы.
+
+        Args:
+            url: str - ссылка на страницу товара.
+            content_hash: str - отпечаток страницы.
+
+        Returns:
+            Объект класса Item, если страница не изменилась,
+            иначе - None.
+        """
+        known_item = self._known_items.get(url)
+        if known_item is not None and known_item.content_hash == content_hash:
+            return known_item
+        if self._known_hashes.get(url) == content_hash:
+            known_item = Item(url=url, content_hash=content_hash)
+            known_item.unchanged = True
+            return known_item
+        return None
+
+    def _build_item(self, url: str, content_hash: str, data: dict) -> Item:
+        """
+        Сборка объекта товара из результата разбора страницы.
+
+        Args:
+            url: str - ссылка на страницу товара.
+            content_hash: str - отпечаток страницы.
+            data: dict - результат parse_item_page.
+
+        Returns:
+            Объект класса Item.
+        """
+        item = Item(
+            name = data['name'],
+            retail_price = data['retail_price'],
+            wholesale_price = data['wholesale_price'],
+            rating = data['rating'],
+            number_of_stores = data['number_of_stores'],
+            url = url,
+            content_hash = content_hash,
+            reviews = [Review(**review) for review in data['reviews']])
+        item.available_stores = list(data['available_stores'])
+        self._known_items[url] = item
+        return item
+
+    def _parse_items(self,
+                     urls: list[str],
+                     reuse_known: bool = True,
+                     deadline: float = None,
+                     checkpoint_email: str = None) -> tuple[list[Item], bool]:
+        """
+        Парсит страницы товаров: потоки загружают страницы, а
+        изменившиеся с прошлого разбора страницы по мере загрузки
+        передаются на разбор в пул процессов.
+
+        Args:
+            urls: list[str] - ссылки на страницы товаров.
+            reuse_known: bool - возвращать ранее полученные товары для
+                                неизменившихся страниц (default: True).
+            deadline: float - момент по time.monotonic, после которого
+                              парсинг прекращается (default: None).
+            checkpoint_email: str - почта, под которой прогресс
+                                    сохраняется в хранилище прогресса;
+                                    уже сохраненные товары повторно не
+                                    загружаются (default: None).
+
+        Returns:
+            Список объектов класса Item в порядке ссылок без повторов
+            и признак того, что разобраны все страницы.
+        """
+        items = {}
+        if checkpoint_email is not None:
+            for url, (content_hash, data) in self._checkpoint.get_parsed(checkpoint_email).items():
+                known_item = self._get_known_item(url, content_hash) if reuse_known else None
+                if known_item is not None:
+                    items[url] = known_item
+                elif data is not None:
+                    items[url] = self._build_item(url, content_hash, data)
+                # Иначе страница совпадала с ранее полученным товаром,
+                # которого теперь нет, и она загружается заново.
+        # Повторяющиеся ссылки отбрасываются: товар не может дважды
+        # входить в избранное одного пользователя.
+        urls = list(dict.fromkeys(urls))
+        remaining = [url for url in urls if url not in items]
+
+        def add_result(url: str, content_hash: str, data: dict) -> None:
+            items[url] = self._build_item(url, content_hash, data)
+            if checkpoint_email is not None:
+                self._checkpoint.save_parsed(checkpoint_email, url, content_hash, data)
+
+        def time_left() -> float:
+            if deadline is None:
+                return None
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise FuturesTimeoutError
+            return left
+
+        cpu_pool = self._cpu_pool
+        # Страницы, переданные на разбор в пул процессов, по задачам.
+        parses = {}
+        chunk = []
+
+        def submit_chunk() -> None:
+            parses[cpu_pool.submit(parse_item_pages, list(chunk))] = list(chunk)
+            chunk.clear()
+
+        def collect_parsed(wait: bool) -> None:
+            # Результаты забираются по мере готовности, чтобы они попадали
+            # в хранилище прогресса до завершения загрузки всех страниц.
+            done = as_completed(list(parses), timeout=time_left()) if wait \
+                else [future for future in parses if future.done()]
+            for future in done:
+                parses.pop(future)
+                for result in future.result():
+                    add_result(*result)
+
+        def add_fetched(result: tuple, in_process: bool = False) -> None:
+            if self._page_cache is not None:
+                url, content_hash, data = result
+            else:
+                url, content = result
+                content_hash, data = self._fingerprint(content), None
+            known_item = self._get_known_item(url, content_hash) if reuse_known else None
+            if known_item is not None:
+                items[url] = known_item
+                if checkpoint_email is not None:
+                    self._checkpoint.save_parsed(checkpoint_email, url, content_hash, None)
+            elif data is not None:
+                add_result(url, content_hash, data)
+            elif cpu_pool is None or in_process:
+                add_result(*parse_item_page((url, content_hash, content)))
+            else:
+                chunk.append((url, content_hash, content))
+                if len(chunk) >= self._chunksize:
+                    submit_chunk()
+
+        complete = True
+        fetches = []
+        added = set()
+        io_pool = ThreadPoolExecutor(max_workers=self._fetch_workers)
+        try:
+            if self._page_cache is not None:
+                # Страницы загружаются и разбираются через общий кэш,
+                # потоки сразу возвращают результат parse_item_page.
+                fetches = [io_pool.submit(self._load_shared_page, url) for url in remaining]
+            else:
+                fetches = [io_pool.submit(self._fetch_page, url) for url in remaining]
+            for future in as_completed(fetches, timeout=time_left()):
+                added.add(future)
+                try:
+                    result = future.result()
+                except Exception as err:
+                    if isinstance(err, FuturesTimeoutError):
+                        raise
+                    # Перед выходом с ошибкой разбираются уже загруженные
+                    # страницы, чтобы они попали в хранилище прогресса.
+                    if chunk:
+                        submit_chunk()
+                    collect_parsed(wait=True)
+                    raise
+                add_fetched(result)
+                collect_parsed(wait=False)
+                time_left()
+            if chunk:
+                submit_chunk()
+            collect_parsed(wait=True)
+        except FuturesTimeoutError:
+            # Страницы, загруженные до истечения deadline, разбираются в
+            # этом процессе, не дожидаясь пула процессов, чтобы они не
+            # пропали и попали в хранилище прогресса.
+            for future in fetches:
+                if future not in added and future.done() and not future.cancelled() \
+                        and future.exception() is None:
+                    add_fetched(future.result(), in_process=True)
+            for future, pages in list(parses.items()):
+                parses.pop(future)
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    results = future.result()
+                else:
+                    future.cancel()
+                    results = parse_item_pages(pages)
+                for result in results:
+                    add_result(*result)
+            for page in chunk:
+                add_result(*parse_item_page(page))
+            chunk.clear()
+            complete = all(url in items for url in urls)
+        finally:
+            # Загрузки, которые уже выполняются, не ожидаются: их время
+            # ограничено таймаутом запроса. Общий пул процессов не
+            # останавливается, отменяются только задачи этого вызова.
+            io_pool.shutdown(wait=False, cancel_futures=True)
+            for future in parses:
+                future.cancel()
+        return [items[url] for url in urls if url in items], complete
+
+    def _get_favorite_items(self, deadline: float = None) -> tuple[list[Item], bool]:
+        """
+        Получение списка избранных товаров пользователя. Если задано
+        хранилище прогресса, прерванный ранее парсинг продолжается
+        с оставшихся товаров.
+
+        Args:
+            deadline: float - момент по time.monotonic, после которого
+                              парсинг прекращается (default: None).
+
+        Returns:
+            Список объектов класса Item и признак того, что получены
+            все товары.
+        """
+        urls = self._checkpoint.get_urls(self._email) if self._checkpoint is not None else None
+        if urls is None:
+            try:
+                content = self._get(self._WISHLIST_URL, headers=self._headers, per_account=True)
+            except FuturesTimeoutError:
+                # Время парсинга истекло до получения списка избранного.
+                return [], False
+            html = BeautifulSoup(content, 'html.parser')
+            urls = [item.a['href'] for item in html.find_all('div', class_='ty-grid-list__item-name')]
+            if self._checkpoint is not None:
+                self._checkpoint.start(self._email, urls)
+        # В режиме воспроизведения страницы разбираются заново, даже если
+        # они не изменились: архив воспроизводят, чтобы применить
+        # исправленный разбор к ранее загруженным страницам.
+        items, complete = self._parse_items(
+            urls,
+            reuse_known=not self._replay,
+            deadline=deadline,
+            checkpoint_email=self._email if self._checkpoint is not None else None)
+        if complete and self._checkpoint is not None:
+            self._checkpoint.finish(self._email)
+        return items, complete
 
     def log_in(self, email: str, password: str) -> None:
         """
@@ -93,6 +619,14 @@ class SiriustParser:
             AuthorizationError, если авторизация не
             завершилась успехом.
         """
+        # Ранее полученные товары относятся к предыдущему пользователю
+        # и не должны попасть в избранное нового.
+        self._known_items = {}
+        self._known_hashes = {}
+        if self._replay:
+            self._email = email
+            self._password = password
+            return
         payload = {
             'user_login': email,
             'password': password,
@@ -105,6 +639,7 @@ class SiriustParser:
         if 'cp_email' not in session.cookies:
             raise AuthorizationError
         self._session = session
+        self._email = email
         self._password = password
 
     def parse(self) -> User:
@@ -113,26 +648,48 @@ class SiriustParser:
         в объект класса User.
 
         Returns:
-            Объект класса User с полученными данными.
+            Объект класса User с полученными данными. Если парсинг
+            прерван по истечении deadline, атрибут incomplete
+            объекта равен True.
+
+        Raises:
+            ParsingTimeoutError, если сайт не ответил вовремя
+            и данные профиля не получены.
         """
-        response = self._session.get('https://siriust.ru/profiles-update/', headers=self._headers)
-        html = BeautifulSoup(response.content, 'html.parser')
+        deadline = time.monotonic() + self._deadline if self._deadline is not None else None
+        self._run_deadline = deadline
+        try:
+            content = self._get(self._PROFILE_URL, headers=self._headers, per_account=True)
+            favorite_items, complete = self._get_favorite_items(deadline)
+        except (FuturesTimeoutError, requests.Timeout) as err:
+            raise ParsingTimeoutError from err
+        finally:
+            self._run_deadline = None
+        html = BeautifulSoup(content, 'html.parser')
 
         email = html.find('input', {'name':'user_data[email]'})['value']
         name = html.find('input', {'name': 'user_data[s_firstname]'})['value']
         last_name = html.find('input', {'name':'user_data[s_lastname]'})['value']
         city = html.find('input', {'name': 'user_data[s_city]'})['value']
 
-        return User(
+        user = User(
             email=email,
             password= self._password,
             first_name=name,
             last_name=last_name,
             city=city,
-            favorite_items=self._get_favorite_items()
+            favorite_items=favorite_items
         )
+        user.incomplete = not complete
+        return user
 
 class AuthorizationError(Exception):
     """Исключение описывающее ошибку при авторизации."""
     def __init__(self) -> None:
         super().__init__('Не получилось авторизоваться.')
+
+
+class ParsingTimeoutError(Exception):
+    """Исключение, описывающее истечение времени ожидания ответа сайта."""
+    def __init__(self) -> None:
+        super().__init__('Сайт не ответил вовремя, данные пользователя не получены.')
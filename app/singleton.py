@@ -1,7 +1,7 @@
 def singleton(cls):
     instances = {}
-    def getinstance():
+    def getinstance(*args, **kwargs):
         if cls not in instances:
-            instances[cls] = cls()
+            instances[cls] = cls(*args, **kwargs)
         return instances[cls]
     return getinstance
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""Генерация синтетической БД для нагрузочного тестирования."""
+import random
+from sqlalchemy import create_engine, insert, select, func
+from app.entities import Base, User, Item, Review, Store, user_to_item
+
+_FIRST_NAMES = ('Иван', 'Петр', 'Анна', 'Мария', 'Алексей', 'Ольга', 'Дмитрий', 'Елена', 'Сергей', 'Наталья')
+_LAST_NAMES = ('Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов')
+_CITIES = ('Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань', 'Самара', '')
+_PRODUCTS = ('Дисплей', 'Аккумулятор', 'Шлейф', 'Корпус', 'Камера', 'Динамик', 'Разъем зарядки', 'Стекло')
+_MODELS = ('iPhone 11', 'iPhone 12', 'Galaxy A51', 'Redmi Note 9', 'P30 Lite', 'Mi 11', 'Honor 20')
+_WORDS = ('отличный', 'качество', 'доставка', 'быстро', 'подошел', 'брак', 'цена', 'рекомендую',
+          'работает', 'установил', 'оригинал', 'копия', 'упаковка', 'магазин', 'телефон', 'экран')
+
+
+def _price(rng: random.Random) -> str:
+    """Цена в формате сайта."""
+    return f'{rng.randint(100, 30000):,}'.replace(',', ' ')
+
+
+def generate_database(path: str,
+                      users: int = 1000,
+                      items_per_user: int = 10,
+                      reviews_per_item: int = 3,
+                      stores: int = 30,
+                      seed: int = 0,
+                      chunk_size: int = 10000) -> None:
+    """
+    Заполнение БД синтетическими пользователями, товарами и отзывами.
+    Как и в данных парсера, каждый товар относится к одному
+    пользователю. Данные вставляются пакетами без создания объектов
+    ORM, поэтому генерация больших БД занимает секунды.
+
+    Args:
+        path: str - путь к файлу БД, схема создается при отсутствии.
+        users: int - количество пользователей (default: 1000).
+        items_per_user: int - среднее количество избранных товаров
+                              пользователя (default: 10).
+        reviews_per_item: int - среднее количество отзывов о товаре
+                                (default: 3).
+        stores: int - количество магазинов (default: 30).
+        seed: int - начальное значение генератора случайных чисел
+                    (default: 0).
+        chunk_size: int - количество строк в одном пакете вставки
+                          (default: 10000).
+    """
+    rng = random.Random(seed)
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        start_user_id = (connection.execute(select(func.max(User.id))).scalar() or 0) + 1
+        start_item_id = (connection.execute(select(func.max(Item.id))).scalar() or 0) + 1
+
+        existing_stores = set(connection.execute(select(Store.name)).scalars())
+        new_stores = [{'name': f'Магазин №{number}'} for number in range(1, stores + 1)
+                      if f'Магазин №{number}' not in existing_stores]
+        if new_stores:
+            connection.execute(insert(Store), new_stores)
+        store_ids = list(connection.execute(select(Store.id)).scalars())
+
+        user_rows, item_rows, link_rows, review_rows = [], [], [], []
+
+        def flush(force: bool = False) -> None:
+            for table, rows in ((User, user_rows), (Item, item_rows),
+                                (user_to_item, link_rows), (Review, review_rows)):
+                if rows and (force or len(rows) >= chunk_size):
+                    connection.execute(insert(table), rows)
+                    rows.clear()
+
+        item_id = start_item_id
+        for user_id in range(start_user_id, start_user_id + users):
+            user_rows.append({
+                'id': user_id,
+                'email': f'user{user_id}@example.com',
+                'password': f'password{user_id}',
+                'first_name': rng.choice(_FIRST_NAMES),
+                'last_name': rng.choice(_LAST_NAMES),
+                'city': rng.choice(_CITIES),
+            })
+            for _ in range(rng.randint(0, 2 * items_per_user)):
+                available = rng.sample(store_ids, rng.randint(0, len(store_ids)))
+                bits = sum(1 << store_id for store_id in available)
+                item_rows.append({
+                    'id': item_id,
+                    'name': f'{rng.choice(_PRODUCTS)} для {rng.choice(_MODELS)}',
+                    'retail_price': _price(rng),
+                    'wholesale_price': _price(rng),
+                    'rating': rng.randint(0, 10) / 2,
+                    'number_of_stores': len(available),
+                    'url': f'https://siriust.ru/item-{item_id}/',
+                    'content_hash': f'{rng.getrandbits(256):064x}',
+                    'stores_bitmap': bits.to_bytes((bits.bit_length() + 7) // 8, 'little'),
+                })
+                link_rows.append({'user_id': user_id, 'item_id': item_id})
+                for _ in range(rng.randint(0, 2 * reviews_per_item)):
+                    review_rows.append({
+                        'author_name': f'{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}',
+                        'score': rng.randint(1, 5),
+                        'text': ' '.join(rng.choices(_WORDS, k=rng.randint(3, 40))),
+                        'item_id': item_id,
+                    })
+                item_id += 1
+            flush()
+        flush(force=True)
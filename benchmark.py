@@ -0,0 +1,108 @@
+import argparse
+import os
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.db import DBTool
+from app.entities import User, Item, Review
+from app.synthetic import generate_database
+
+
+class QueryCounter:
+    """Счетчик SQL-запросов, выполненных всеми соединениями."""
+    def __init__(self) -> None:
+        """Инициализация объекта класса."""
+        self.count = 0
+        event.listen(Engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+
+def _make_user(email: str, items: int) -> User:
+    """Создание пользователя с товарами, как после парсинга."""
+    return User(
+        email=email,
+        password='password',
+        first_name='Бенчмарк',
+        last_name='Бенчмарков',
+        city='Москва',
+        favorite_items=[
+            Item(name=f'Товар {i}',
+                 retail_price='1 000',
+                 wholesale_price='900',
+                 rating=4.5,
+                 number_of_stores=2,
+                 url=f'https://siriust.ru/bench-{email}-{i}/',
+                 reviews=[Review(author_name='Автор', score=5, text='отличный товар')])
+            for i in range(items)
+        ])
+
+
+def _measure(name: str, counter: QueryCounter, operation, repeat: int = 1) -> None:
+    """
+    Замер времени и количества запросов операции и вывод результата.
+
+    Args:
+        name: str - название операции.
+        counter: QueryCounter - счетчик запросов.
+        operation - функция, принимающая номер повтора.
+        repeat: int - количество повторов (default: 1).
+    """
+    queries = counter.count
+    start = time.perf_counter()
+    for i in range(repeat):
+        operation(i)
+    elapsed = time.perf_counter() - start
+    queries = counter.count - queries
+    print(f'{name:<48}{elapsed:>10.3f} с{elapsed / repeat * 1000:>12.2f} мс/оп{queries / repeat:>12.1f} запр/оп')
+
+
+def main(args):
+    if args.generate:
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        start = time.perf_counter()
+        generate_database(args.db, args.users, args.items, args.reviews, args.stores, args.seed)
+        print(f'Генерация БД: {time.perf_counter() - start:.3f} с')
+
+    counter = QueryCounter()
+    start = time.perf_counter()
+    db = DBTool(args.db, args.cache_size)
+    print(f'Открытие БД: {time.perf_counter() - start:.3f} с')
+    print(f'Размер файла БД: {os.path.getsize(args.db) / 1024 / 1024:.2f} МБ\n')
+
+    users = []
+    _measure('get_users', counter, lambda i: users.extend(db.get_users()))
+    _measure('Полная текстовая выгрузка (str(User))', counter,
+             lambda i: [str(user) for user in users])
+    _measure('add_or_update_user (новый пользователь)', counter,
+             lambda i: db.add_or_update_user(_make_user(f'bench{i}@example.com', args.items)),
+             args.repeat)
+    _measure('add_or_update_user (обновление, _update_user)', counter,
+             lambda i: db.add_or_update_user(_make_user(f'bench{i}@example.com', args.items)),
+             args.repeat)
+    _measure('search_reviews', counter, lambda i: db.search_reviews('отличный'), args.repeat)
+    _measure('get_user (первое чтение)', counter, lambda i: db.get_user(user_id=i + 1), args.repeat)
+    _measure('get_user (повторное чтение)', counter, lambda i: db.get_user(user_id=i + 1), args.repeat)
+    print(f'Кэш пользователей: {db.cache_stats()}')
+    print(f'\nРазмер файла БД: {os.path.getsize(args.db) / 1024 / 1024:.2f} МБ')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Нагрузочное тестирование слоя работы с БД')
+    arg_parser.add_argument('--db', default='bench.db', help='Путь к файлу БД (default: bench.db)')
+    arg_parser.add_argument('--generate', action='store_true',
+                            help='Пересоздать БД с синтетическими данными перед замерами')
+    arg_parser.add_argument('--users', type=int, default=10000, help='Количество пользователей')
+    arg_parser.add_argument('--items', type=int, default=10,
+                            help='Среднее количество избранных товаров пользователя')
+    arg_parser.add_argument('--reviews', type=int, default=3, help='Среднее количество отзывов о товаре')
+    arg_parser.add_argument('--stores', type=int, default=30, help='Количество магазинов')
+    arg_parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора')
+    arg_parser.add_argument('--cache-size', type=int, default=1024,
+                            help='Размер кэша пользователей DBTool (default: 1024)')
+    arg_parser.add_argument('--repeat', type=int, default=20,
+                            help='Количество повторов операций записи и поиска')
+    args = arg_parser.parse_args()
+    main(args)
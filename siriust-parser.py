@@ -1,15 +1,39 @@
 import argparse
+import sys
+from app.archive import ResponseArchive
+from app.checkpoint import CrawlCheckpoint
 from app.db import DBTool
 from app.parser import SiriustParser
 from app.console_app import ConsoleApp
-from app.gui_app import GuiApp
+from app.bulk_app import BulkApp, read_credentials
 
 
 def main(args):
     db = DBTool()
-    parser = SiriustParser()
-    app = ConsoleApp(db, parser) if args.nogui else GuiApp(db, parser)
-    app.run()
+    archive = ResponseArchive(args.archive) if args.archive else None
+    parser = SiriustParser(fetch_workers=args.fetch_workers,
+                           parse_workers=args.parse_workers,
+                           chunksize=args.chunksize,
+                           archive=archive,
+                           replay=args.replay,
+                           checkpoint=CrawlCheckpoint(args.checkpoint) if args.checkpoint else None,
+                           deadline=args.deadline)
+    if args.bulk:
+        if args.bulk == '-':
+            credentials = read_credentials(sys.stdin)
+        else:
+            with open(args.bulk, encoding='utf-8') as f:
+                credentials = read_credentials(f)
+        app = BulkApp(db, parser, credentials, args.bulk_workers, args.batch_size)
+    elif args.nogui:
+        app = ConsoleApp(db, parser)
+    else:
+        from app.gui_app import GuiApp
+        app = GuiApp(db, parser)
+    try:
+        app.run()
+    finally:
+        parser.close()
 
 
 if __name__ == '__main__':
@@ -23,5 +47,45 @@ if __name__ == '__main__':
     arg_parser.add_argument('--nogui',
                             action='store_true',
                             help='Запуск приложения без графического интерфейса')
+    arg_parser.add_argument('--fetch-workers',
+                            type=int,
+                            default=1,
+                            help='Количество потоков, загружающих страницы товаров')
+    arg_parser.add_argument('--parse-workers',
+                            type=int,
+                            default=0,
+                            help='Количество процессов, разбирающих страницы товаров (0 - без пула процессов)')
+    arg_parser.add_argument('--chunksize',
+                            type=int,
+                            default=1,
+                            help='Количество страниц, передаваемых процессу разбора за раз')
+    arg_parser.add_argument('--archive',
+                            metavar='DIR',
+                            help='Каталог архива, в который записываются загруженные страницы')
+    arg_parser.add_argument('--replay',
+                            action='store_true',
+                            help='Брать страницы из архива (--archive) без обращения к сайту')
+    arg_parser.add_argument('--checkpoint',
+                            metavar='FILE',
+                            help='Файл для сохранения прогресса парсинга, позволяющий продолжить прерванный парсинг')
+    arg_parser.add_argument('--deadline',
+                            type=float,
+                            metavar='SECONDS',
+                            help='Ограничение времени парсинга одного пользователя; по его истечении '
+                                 'сохраняются уже полученные данные')
+    arg_parser.add_argument('--bulk',
+                            metavar='FILE',
+                            help=('Неинтерактивная загрузка пользователей из файла со строками '
+                                  'вида почта:пароль (- для стандартного ввода)'))
+    arg_parser.add_argument('--bulk-workers',
+                            type=int,
+                            default=4,
+                            help='Количество одновременно обрабатываемых пользователей в режиме --bulk')
+    arg_parser.add_argument('--batch-size',
+                            type=int,
+                            default=50,
+                            help='Количество пользователей, сохраняемых в БД за одну транзакцию в режиме --bulk')
     args = arg_parser.parse_args()
+    if args.replay and not args.archive:
+        arg_parser.error('--replay требует указания --archive')
     main(args)
\ No newline at end of file